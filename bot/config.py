@@ -25,6 +25,17 @@ class Config:
         self.max_results = int(os.getenv('MAX_SEARCH_RESULTS', '5'))
         self.similarity_threshold = float(os.getenv('SIMILARITY_THRESHOLD', '70.0'))
         self.cache_duration = int(os.getenv('CACHE_DURATION_MINUTES', '1'))
+        # Minimum shared character trigrams for a question to be fuzzy-scored (0 disables the prefilter)
+        self.trigram_prefilter_min = int(os.getenv('TRIGRAM_PREFILTER_MIN', '0'))
+
+        # Webhook settings: when WEBHOOK_URL (public base URL) is set, Telegram pushes
+        # updates to the bot instead of the bot polling getUpdates. The same server
+        # answers the keep-alive endpoints, so it defaults to the keep-alive port
+        self.webhook_url = os.getenv('WEBHOOK_URL', '')
+        self.webhook_port = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '3000')))
+
+        # Keep-alive server for Replit in polling mode (webhook mode always serves its endpoints)
+        self.keep_alive = os.getenv('KEEP_ALIVE', '').lower() in ('1', 'true', 'yes')
         
         # Validate configuration
         self._validate_config()
@@ -43,5 +54,8 @@ class Config:
             
         if self.max_results < 1:
             raise ValueError("MAX_SEARCH_RESULTS must be at least 1")
+
+        if self.trigram_prefilter_min < 0:
+            raise ValueError("TRIGRAM_PREFILTER_MIN must not be negative")
             
         logger.info("Configuration validation passed")
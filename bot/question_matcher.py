@@ -3,14 +3,45 @@
 Находит наиболее релевантные ответы на основе вопросов пользователей.
 """
 
+import numpy as np
 import pandas as pd
 import logging
-from typing import List, Dict, Tuple, Optional
-from fuzzywuzzy import fuzz, process
+from typing import Any, List, Dict, NamedTuple, Tuple, Optional
+from rapidfuzz import fuzz, process
 import re
+from functools import lru_cache
+
+from .sheets_manager import frame_columns, text_trigrams
 
 logger = logging.getLogger(__name__)
 
+_WS_RE = re.compile(r'\s+')
+_NONWORD_RE = re.compile(r'[^\w\s]')
+
+
+class Match(NamedTuple):
+    """A knowledge base entry matched to a user question."""
+    question: str
+    answer: str
+    category: str
+    priority: int
+    score: int
+    last_updated: Any
+
+
+@lru_cache(maxsize=1024)
+def _clean_text(text: str) -> str:
+    """Lowercase, drop special characters and collapse whitespace."""
+    cleaned = _NONWORD_RE.sub(' ', text.lower())
+    return _WS_RE.sub(' ', cleaned).strip()
+
+
+@lru_cache(maxsize=4096)
+def _score_cached(question1: str, question2: str) -> int:
+    """Token sort similarity of two cleaned questions."""
+    return round(fuzz.token_sort_ratio(question1, question2))
+
+
 class QuestionMatcher:
     """Обеспечивает нечеткое сопоставление вопросов пользователей с базой знаний."""
     
@@ -19,9 +50,19 @@ class QuestionMatcher:
         self.config = config
         self.similarity_threshold = config.similarity_threshold
         self.max_results = config.max_results
+        self.trigram_prefilter_min = config.trigram_prefilter_min
     
-    def find_matches(self, user_question: str, knowledge_base: pd.DataFrame) -> List[Dict]:
-        """Найти соответствующие вопросы в базе знаний."""
+    def find_matches(self, user_question: str, knowledge_base: pd.DataFrame,
+                     columns: Optional[Dict[str, Any]] = None) -> List[Match]:
+        """Найти соответствующие вопросы в базе знаний.
+        
+        columns - столбцы базы знаний (KnowledgeBaseSnapshot.columns);
+        если не переданы, строятся из knowledge_base.
+        """
+        threshold = self.similarity_threshold
+        limit = self.max_results
+        prefilter_min = self.trigram_prefilter_min
+        
         try:
             if knowledge_base.empty:
                 logger.warning("База знаний пуста")
@@ -34,67 +75,94 @@ class QuestionMatcher:
                 logger.warning("Вопрос пользователя пуст после очистки")
                 return []
             
-            # Get all questions from knowledge base
-            questions = knowledge_base['Question'].tolist()
-            
-            # Find matches using fuzzy string matching
+            # Token-sort the query the same way CSVManager pre-processes
+            # the knowledge base questions
+            sorted_question = ' '.join(sorted(cleaned_question.split()))
+            
+            if columns is None:
+                columns = frame_columns(knowledge_base)
+            
+            # Pre-processed questions from the knowledge base
+            questions = columns['_q_processed']
+            
+            # Optionally skip questions sharing too few character trigrams with the query
+            candidates = None
+            if prefilter_min:
+                query_trigrams = text_trigrams(sorted_question)
+                question_trigrams = columns.get('_trigrams')
+                if question_trigrams is None:
+                    question_trigrams = [text_trigrams(question) for question in questions]
+                candidates = [
+                    i for i, trigrams in enumerate(question_trigrams)
+                    if len(query_trigrams & trigrams) >= prefilter_min
+                ]
+                questions = [questions[i] for i in candidates]
+            
+            # Find matches using fuzzy string matching; score_cutoff lets
+            # RapidFuzz drop candidates below the threshold internally
             matches = process.extract(
-                cleaned_question,
+                sorted_question,
                 questions,
-                scorer=fuzz.token_sort_ratio,
-                limit=self.max_results * 2  # Get more candidates for filtering
+                scorer=fuzz.ratio,
+                processor=None,
+                score_cutoff=threshold,
+                limit=limit * 2  # Get more candidates for filtering
             )
             
-            # Filter matches above threshold and format results
+            # Map prefiltered positions back to knowledge base positions
+            if candidates is not None:
+                matches = [(text, score, candidates[idx]) for text, score, idx in matches]
+            
+            if not matches:
+                logger.info("Found 0 matches for question: '%s'", user_question)
+                return []
+            
+            # Order by score (descending) and priority (ascending - lower is higher priority)
+            # with a single numpy sort, then build dicts only for the top results
+            scores = np.round(np.fromiter((score for _, score, _ in matches), dtype=np.float64, count=len(matches)))
+            positions = np.fromiter((idx for _, _, idx in matches), dtype=np.intp, count=len(matches))
+            priority_col = columns.get('Priority')
+            priorities = priority_col[positions] if priority_col is not None else np.full(len(matches), 5, dtype=np.int8)
+            order = np.lexsort((priorities, -scores))[:limit]
+            
+            # Check optional columns once per query
+            question_col = columns['Question']
+            answer_col = columns['Answer']
+            category_col = columns.get('Category')
+            last_updated_col = columns.get('Last Updated')
+            
+            # Build results by position, without materializing DataFrame rows
             results = []
-            for match_text, score in matches:
-                if score >= self.similarity_threshold:
-                    # Find the corresponding row in the dataframe
-                    row = knowledge_base[knowledge_base['Question'] == match_text].iloc[0]
-                    
-                    result = {
-                        'question': row['Question'],
-                        'answer': row['Answer'],
-                        'category': row.get('Category', 'General'),
-                        'priority': row.get('Priority', 5),
-                        'score': score,
-                        'last_updated': row.get('Last Updated', None)
-                    }
-                    results.append(result)
-            
-            # Sort by score (descending) and priority (ascending - lower is higher priority)
-            results.sort(key=lambda x: (-x['score'], x['priority']))
-            
-            # Limit to max results
-            results = results[:self.max_results]
-            
-            logger.info(f"Found {len(results)} matches for question: '{user_question}'")
+            for i in order:
+                idx = positions[i]
+                results.append(Match(
+                    question=question_col[idx],
+                    answer=answer_col[idx],
+                    category=category_col[idx] if category_col is not None else 'General',
+                    priority=int(priorities[i]),
+                    score=int(scores[i]),
+                    last_updated=last_updated_col[idx] if last_updated_col is not None else None
+                ))
+            
+            logger.info("Found %s matches for question: '%s'", len(results), user_question)
             return results
             
         except Exception as e:
-            logger.error(f"Error finding matches: {str(e)}")
+            logger.error("Error finding matches: %s", e)
             return []
     
+    def normalize_question(self, question: str) -> str:
+        """Get the normalized form of a question that matching depends on."""
+        return self._clean_question(question)
+    
     def _clean_question(self, question: str) -> str:
         """Clean and normalize the user question."""
         if not question:
             return ""
         
-        # Convert to lowercase
-        cleaned = question.lower().strip()
-        
-        # Remove extra whitespace
-        cleaned = re.sub(r'\s+', ' ', cleaned)
-        
-        # Remove special characters that might interfere with matching
-        cleaned = re.sub(r'[^\w\s]', ' ', cleaned)
-        
-        # Remove extra spaces again
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
-        
-        return cleaned
+        return _clean_text(question)
     
-    def get_best_match(self, user_question: str, knowledge_base: pd.DataFrame) -> Optional[Dict]:
+    def get_best_match(self, user_question: str, knowledge_base: pd.DataFrame) -> Optional[Match]:
         """Get the single best match for a user question."""
         matches = self.find_matches(user_question, knowledge_base)
         
@@ -103,39 +171,35 @@ class QuestionMatcher:
         
         return None
     
-    def search_by_category(self, user_question: str, knowledge_base: pd.DataFrame, category: str) -> List[Dict]:
-        """Search for matches within a specific category."""
+    def search_by_category(self, user_question: str, knowledge_base: pd.DataFrame, category: str,
+                           category_index: Optional[Dict[str, np.ndarray]] = None) -> List[Match]:
+        """Search for matches within a specific category.
+        
+        category_index - lowercased category to row positions (KnowledgeBaseSnapshot.category_index);
+        if not given, the category is filtered with a column scan.
+        """
         try:
             if knowledge_base.empty:
                 return []
             
             # Filter by category
-            category_df = knowledge_base[
-                knowledge_base['Category'].str.lower() == category.lower()
-            ]
+            if category_index is not None:
+                positions = category_index.get(category.lower())
+                category_df = knowledge_base.iloc[positions] if positions is not None else knowledge_base.iloc[0:0]
+            else:
+                category_df = knowledge_base[
+                    knowledge_base['Category'].str.lower() == category.lower()
+                ]
             
             if category_df.empty:
-                logger.warning(f"No questions found in category: {category}")
+                logger.warning("No questions found in category: %s", category)
                 return []
             
             # Find matches in the filtered data
             return self.find_matches(user_question, category_df)
             
         except Exception as e:
-            logger.error(f"Error searching by category: {str(e)}")
-            return []
-    
-    def get_categories(self, knowledge_base: pd.DataFrame) -> List[str]:
-        """Get all available categories from the knowledge base."""
-        try:
-            if knowledge_base.empty or 'Category' not in knowledge_base.columns:
-                return []
-            
-            categories = knowledge_base['Category'].dropna().unique().tolist()
-            return sorted(categories)
-            
-        except Exception as e:
-            logger.error(f"Error getting categories: {str(e)}")
+            logger.error("Error searching by category: %s", e)
             return []
     
     def get_similarity_score(self, question1: str, question2: str) -> int:
@@ -147,8 +211,8 @@ class QuestionMatcher:
             if not cleaned_q1 or not cleaned_q2:
                 return 0
             
-            return fuzz.token_sort_ratio(cleaned_q1, cleaned_q2)
+            return _score_cached(cleaned_q1, cleaned_q2)
             
         except Exception as e:
-            logger.error(f"Error calculating similarity score: {str(e)}")
+            logger.error("Error calculating similarity score: %s", e)
             return 0
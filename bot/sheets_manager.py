@@ -3,15 +3,77 @@ CSV file manager for the knowledge base.
 Handles CSV file reading and data processing.
 """
 
+import numpy as np
 import pandas as pd
+import atexit
+import csv
+import hashlib
 import logging
 import os
+import re
 import requests
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, List, NamedTuple, Tuple
 from datetime import datetime, timedelta
+from io import BytesIO
 
 logger = logging.getLogger(__name__)
 
+_NONWORD_RE = re.compile(r'[^\w\s]')
+
+UNANSWERED_QUESTIONS_FILE = "unanswered_questions.csv"
+UNANSWERED_FLUSH_EVERY = 10  # Flush buffered unanswered questions every N writes (and by flush_unanswered)
+
+# Header written when the knowledge base CSV file is created by append_rows
+KNOWLEDGE_BASE_COLUMNS = ('Category', 'Question', 'Answer', 'Priority', 'Last Updated')
+
+# Bump when _clean_data output changes so stale pickled copies are ignored
+PICKLE_FORMAT_VERSION = 3
+
+# Columns kept as plain lists (Priority as a numpy array) for per-match
+# access without row materialization
+CACHED_COLUMNS = ('Question', 'Answer', 'Category', 'Priority', 'Last Updated', '_q_processed')
+
+
+def text_trigrams(text: str) -> frozenset:
+    """Get the set of character trigrams of a text."""
+    return frozenset(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def frame_columns(df: pd.DataFrame) -> Dict[str, Any]:
+    """Get knowledge base columns as plain lists, with Priority as a numpy array."""
+    return {
+        col: df[col].to_numpy() if col == 'Priority' else df[col].tolist()
+        for col in CACHED_COLUMNS if col in df.columns
+    }
+
+
+class KnowledgeBaseSnapshot(NamedTuple):
+    """Knowledge base frame and the lookups built from it, replaced as a whole on reload."""
+    data: pd.DataFrame
+    version: int
+    columns: Dict[str, Any]  # plain lists, Priority as a numpy array
+    category_index: Dict[str, np.ndarray]  # lowercased category -> row positions
+    categories: List[str]  # sorted
+    categories_token: str  # short hash of the category list, stable across restarts
+
+    def category_questions(self, category: str, limit: int) -> Tuple[List[str], int]:
+        """Get up to `limit` questions of a category (case-insensitive) and the category size."""
+        positions = self.category_index.get(category.lower())
+        if positions is None:
+            return [], 0
+        questions = self.columns['Question']
+        return [questions[i] for i in positions[:limit]], len(positions)
+
+
+def categories_token(categories: List[str]) -> str:
+    """Get a short hash identifying a category list."""
+    return hashlib.blake2b('\n'.join(categories).encode(), digest_size=4).hexdigest()
+
+
+EMPTY_SNAPSHOT = KnowledgeBaseSnapshot(pd.DataFrame(), 0, {}, {}, [], categories_token([]))
+
+
 class CSVManager:
     """Manages CSV file integration for knowledge base."""
 
@@ -20,23 +82,49 @@ class CSVManager:
         self.config = config
         self.csv_file_path = config.csv_file_path
         self.google_sheets_csv_url = config.google_sheets_csv_url
-        self.data_cache = None
+        # Swapped in a single assignment, so readers on other threads never see a partial reload
+        self.snapshot: Optional[KnowledgeBaseSnapshot] = None
         self.cache_time = None
-        self.last_modified = None
+        self.last_modified: Optional[float] = None  # CSV mtime (epoch seconds) of cached data
+        # Validators of the last Google Sheets response for conditional requests
+        self._sheets_etag: Optional[str] = None
+        self._sheets_last_modified: Optional[str] = None
+        self._sheets_content_hash: Optional[str] = None
+
+        # Unanswered questions log is kept open and flushed in batches
+        self._unanswered_lock = threading.Lock()
+        self._unanswered_pending = 0
+        self._unanswered_file = open(UNANSWERED_QUESTIONS_FILE, "a", encoding="utf-8", newline="", buffering=8192)
+        self._unanswered_writer = csv.writer(self._unanswered_file, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        if self._unanswered_file.tell() == 0:
+            self._unanswered_writer.writerow(["timestamp", "user_id", "username", "question"])
+        atexit.register(self._unanswered_file.close)
+
+    @property
+    def data_cache(self) -> Optional[pd.DataFrame]:
+        """Cached knowledge base frame."""
+        snapshot = self.snapshot
+        return snapshot.data if snapshot is not None else None
+
+    @property
+    def kb_version(self) -> int:
+        """Version of the cached knowledge base, incremented whenever a new one is cached."""
+        snapshot = self.snapshot
+        return snapshot.version if snapshot is not None else 0
 
     def _is_cache_valid(self) -> bool:
         """Check if cached data is still valid."""
         if self.data_cache is None or not self.cache_time:
             return False
 
-        # Check if file has been modified
-        if not os.path.exists(self.csv_file_path):
+        # Check if file has been modified (a single stat call)
+        try:
+            file_modified = os.stat(self.csv_file_path).st_mtime
+        except FileNotFoundError:
             return False
 
-        file_modified = datetime.fromtimestamp(os.path.getmtime(self.csv_file_path))
-
         # If file was modified after cache, invalidate cache
-        if self.last_modified and file_modified > self.last_modified:
+        if self.last_modified is not None and file_modified > self.last_modified:
             return False
 
         # Check cache expiry
@@ -65,13 +153,18 @@ class CSVManager:
                 logger.info("Loading knowledge base from Google Sheets CSV URL")
                 try:
                     df = self._load_from_google_sheets()
-                    # Cache the data
-                    self.data_cache = df
-                    self.cache_time = datetime.now()
-                    logger.info(f"Successfully loaded {len(df)} records from Google Sheets")
+                    if df is self.data_cache:
+                        # Sheet not modified (304 or same content), extend the current cache
+                        self.cache_time = datetime.now()
+                        logger.info("Google Sheets data not modified, keeping cached knowledge base")
+                        return df
+                    # Cache the data; it no longer matches the local CSV file
+                    self._update_cache(df)
+                    self.last_modified = None
+                    logger.info("Successfully loaded %s records from Google Sheets", len(df))
                     return df
                 except Exception as e:
-                    logger.warning(f"Failed to load from Google Sheets: {str(e)}")
+                    logger.warning("Failed to load from Google Sheets: %s", e)
                     logger.info("Falling back to local CSV file")
 
             # Return cached data if valid for local file
@@ -80,106 +173,229 @@ class CSVManager:
                 return self.data_cache
 
             # Fall back to local CSV file
-            logger.info(f"Loading knowledge base from {self.csv_file_path}")
+            logger.info("Loading knowledge base from %s", self.csv_file_path)
 
             # Check if file exists
-            if not os.path.exists(self.csv_file_path):
-                logger.error(f"CSV file not found: {self.csv_file_path}")
+            try:
+                csv_mtime = os.stat(self.csv_file_path).st_mtime
+            except FileNotFoundError:
+                logger.error("CSV file not found: %s", self.csv_file_path)
                 return pd.DataFrame()
 
-            # Read CSV file
-            df = pd.read_csv(self.csv_file_path)
+            # File not modified since it was cached: extend the cache without reloading
+            if self.data_cache is not None and self.last_modified == csv_mtime:
+                self.cache_time = datetime.now()
+                logger.debug("CSV file not modified, keeping cached knowledge base")
+                return self.data_cache
 
-            if df.empty:
-                logger.warning("CSV file is empty")
-                return pd.DataFrame()
+            # Use the cleaned pickle copy if it is up to date with the CSV file
+            df = self._read_pickle_cache(csv_mtime)
+
+            if df is None:
+                # Read CSV file
+                df = self._read_csv(self.csv_file_path)
+
+                if df.empty:
+                    logger.warning("CSV file is empty")
+                    return pd.DataFrame()
+
+                # Expected columns: Category, Question, Answer, Priority, Last Updated
+                required_columns = ['Category', 'Question', 'Answer']
+                missing_columns = [col for col in required_columns if col not in df.columns]
 
-            # Expected columns: Category, Question, Answer, Priority, Last Updated
-            required_columns = ['Category', 'Question', 'Answer']
-            missing_columns = [col for col in required_columns if col not in df.columns]
+                if missing_columns:
+                    logger.error("Missing required columns in CSV: %s", missing_columns)
+                    raise ValueError(f"Missing required columns: {missing_columns}")
 
-            if missing_columns:
-                logger.error(f"Missing required columns in CSV: {missing_columns}")
-                raise ValueError(f"Missing required columns: {missing_columns}")
+                # Clean and validate data
+                df = self._clean_data(df)
 
-            # Clean and validate data
-            df = self._clean_data(df)
+                self._write_pickle_cache(df, csv_mtime)
 
-            # Cache the data
-            self.data_cache = df
-            self.cache_time = datetime.now()
-            self.last_modified = datetime.fromtimestamp(os.path.getmtime(self.csv_file_path))
+            # Cache the data; it no longer matches the last Google Sheets response
+            self._update_cache(df)
+            self.last_modified = csv_mtime
+            self._sheets_etag = None
+            self._sheets_last_modified = None
+            self._sheets_content_hash = None
 
-            logger.info(f"Successfully loaded {len(df)} records from knowledge base")
+            logger.info("Successfully loaded %s records from knowledge base", len(df))
             return df
 
         except Exception as e:
-            logger.error(f"Failed to get knowledge base: {str(e)}")
+            logger.error("Failed to get knowledge base: %s", e)
             raise
 
+    def _read_csv(self, source, on_bad_lines: str = 'error', **kwargs) -> pd.DataFrame:
+        """Read CSV with the multithreaded pyarrow engine, falling back to the default C engine.
+
+        ``on_bad_lines`` only applies to the C engine: pyarrow would silently drop short
+        rows that the C engine pads with NaN, so ragged files always take the fallback.
+        """
+        try:
+            return pd.read_csv(source, engine='pyarrow', dtype_backend='pyarrow', **kwargs)
+        except (ImportError, ValueError) as e:
+            # pyarrow is not installed, rejects the options or the file has ragged rows
+            logger.debug("pyarrow CSV engine unavailable, using default engine: %s", e)
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            return pd.read_csv(source, on_bad_lines=on_bad_lines, **kwargs)
+
+    def _read_pickle_cache(self, csv_mtime: float) -> Optional[pd.DataFrame]:
+        """Load the cleaned knowledge base pickle if it is not older than the CSV file."""
+        pickle_path = f"{self.csv_file_path}.v{PICKLE_FORMAT_VERSION}.pkl"
+        try:
+            if os.path.getmtime(pickle_path) < csv_mtime:
+                return None
+            df = pd.read_pickle(pickle_path)
+            logger.info("Loaded cleaned knowledge base from %s", pickle_path)
+            return df
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Failed to read pickle cache %s: %s", pickle_path, e)
+            return None
+
+    def _write_pickle_cache(self, df: pd.DataFrame, csv_mtime: float) -> None:
+        """Save the cleaned knowledge base next to the CSV file, stamped with its mtime."""
+        pickle_path = f"{self.csv_file_path}.v{PICKLE_FORMAT_VERSION}.pkl"
+        try:
+            df.to_pickle(pickle_path)
+            os.utime(pickle_path, (csv_mtime, csv_mtime))
+        except Exception as e:
+            logger.warning("Failed to write pickle cache %s: %s", pickle_path, e)
+
+    def _read_sheets_pickle_cache(self, content_hash: str) -> Optional[pd.DataFrame]:
+        """Load the cleaned Google Sheets data pickle if it was built from the same content."""
+        pickle_path = f"{self.csv_file_path}.sheets.v{PICKLE_FORMAT_VERSION}.pkl"
+        try:
+            cached = pd.read_pickle(pickle_path)
+            if cached.get('content_hash') != content_hash:
+                return None
+            logger.info("Google Sheets content unchanged, loaded cleaned data from %s", pickle_path)
+            return cached['data']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Failed to read pickle cache %s: %s", pickle_path, e)
+            return None
+
+    def _write_sheets_pickle_cache(self, df: pd.DataFrame, content_hash: str) -> None:
+        """Save the cleaned Google Sheets data together with the hash of its source content."""
+        pickle_path = f"{self.csv_file_path}.sheets.v{PICKLE_FORMAT_VERSION}.pkl"
+        try:
+            pd.to_pickle({'content_hash': content_hash, 'data': df}, pickle_path)
+        except Exception as e:
+            logger.warning("Failed to write pickle cache %s: %s", pickle_path, e)
+
+    def _update_cache(self, df: pd.DataFrame) -> None:
+        """Build the snapshot of a loaded knowledge base and swap it in."""
+        has_category = 'Category' in df.columns
+        categories = sorted(df['Category'].dropna().unique().tolist()) if has_category else []
+        columns = frame_columns(df)
+        if self.config.trigram_prefilter_min > 0 and '_q_processed' in columns:
+            # Character trigrams of the processed questions, only when the prefilter is on
+            columns['_trigrams'] = [text_trigrams(question) for question in columns['_q_processed']]
+        self.snapshot = KnowledgeBaseSnapshot(
+            data=df,
+            version=self.kb_version + 1,
+            columns=columns,
+            category_index=df.groupby(df['Category'].str.lower()).indices if has_category else {},
+            categories=categories,
+            categories_token=categories_token(categories)
+        )
+        self.cache_time = datetime.now()
+
+    def get_snapshot(self) -> KnowledgeBaseSnapshot:
+        """Get the knowledge base snapshot, loading the data if the cache expired."""
+        df = self.get_knowledge_base()
+        snapshot = self.snapshot
+        if df.empty or snapshot is None:
+            return EMPTY_SNAPSHOT
+        return snapshot
+
     def log_unanswered_question(self, user_question: str, user_id=None, username=None):
         """Записывает вопросы без ответа в CSV."""
         words = user_question.split()
         if len(words) < 3:
             return  # Не записываем короткие вопросы
 
-        from datetime import datetime
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         try:
-            with open("unanswered_questions.csv", "a", encoding="utf-8") as f:
-                f.write(f'"{timestamp}","{user_id}","{username or "Unknown"}","{user_question}"\n')
-            logger.info(f"Вопрос записан: '{user_question}'")
+            with self._unanswered_lock:
+                self._unanswered_writer.writerow([timestamp, user_id, username or "Unknown", user_question])
+                self._unanswered_pending += 1
+                if self._unanswered_pending >= UNANSWERED_FLUSH_EVERY:
+                    self._unanswered_file.flush()
+                    self._unanswered_pending = 0
+            logger.info("Вопрос записан: '%s'", user_question)
         except Exception as e:
-            logger.error(f"Не удалось записать вопрос в CSV: {str(e)}")
+            logger.error("Не удалось записать вопрос в CSV: %s", e)
+
+    def flush_unanswered(self) -> None:
+        """Write buffered unanswered questions to the file."""
+        with self._unanswered_lock:
+            if self._unanswered_pending:
+                self._unanswered_file.flush()
+                self._unanswered_pending = 0
 
     def _load_from_google_sheets(self) -> pd.DataFrame:
         """Load knowledge base data from Google Sheets CSV URL."""
-        # Set proper encoding for the request
-        response = requests.get(self.google_sheets_csv_url, timeout=30)
+        # Conditional request: only download the sheet if it changed since the cached copy
+        headers = {}
+        if self.data_cache is not None:
+            if self._sheets_etag:
+                headers['If-None-Match'] = self._sheets_etag
+            if self._sheets_last_modified:
+                headers['If-Modified-Since'] = self._sheets_last_modified
+
+        response = requests.get(self.google_sheets_csv_url, headers=headers, timeout=30)
+        if response.status_code == 304 and self.data_cache is not None:
+            return self.data_cache
         response.raise_for_status()
 
-        # Try to detect and fix encoding issues
+        self._sheets_etag = response.headers.get('ETag')
+        self._sheets_last_modified = response.headers.get('Last-Modified')
+
         content = response.content
 
-        # Try different encodings
-        text_content = None
-        for encoding in ['utf-8', 'utf-8-sig', 'cp1251', 'latin1']:
-            try:
-                text_content = content.decode(encoding)
-                logger.info(f"Successfully decoded with {encoding} encoding")
-                break
-            except UnicodeDecodeError:
-                continue
+        # Skip parsing if the sheet content has not changed since the last load
+        content_hash = hashlib.sha256(content).hexdigest()
+        if self.data_cache is not None and content_hash == self._sheets_content_hash:
+            return self.data_cache
 
-        if text_content is None:
-            text_content = content.decode('utf-8', errors='replace')
-            logger.warning("Used utf-8 with error replacement")
+        df = self._read_sheets_pickle_cache(content_hash)
+        if df is not None:
+            self._sheets_content_hash = content_hash
+            return df
 
-        # Debug: Log the raw response
-        logger.info(f"Raw response content (first 500 chars): {text_content[:500]}")
+        # Detect the encoding once and let pandas decode the bytes itself
+        encoding = response.apparent_encoding or 'utf-8'
+        logger.info("Detected Google Sheets CSV encoding: %s", encoding)
 
         # Parse CSV from response content with error handling
-        from io import StringIO
         try:
-            # Try with different parameters to handle CSV formatting issues
-            df = pd.read_csv(StringIO(text_content), 
-                           on_bad_lines='skip',  # Skip problematic lines
-                           quoting=1)  # Handle quoted fields
+            df = self._read_csv(BytesIO(content),
+                                encoding=encoding,
+                                on_bad_lines='skip')  # Skip problematic lines
         except Exception as e:
-            logger.warning(f"Failed to parse CSV with standard settings: {e}")
+            logger.warning("Failed to parse CSV with standard settings: %s", e)
             # Try with more relaxed settings
-            df = pd.read_csv(StringIO(text_content), 
+            df = pd.read_csv(BytesIO(content),
+                           encoding=encoding,
+                           encoding_errors='replace',
                            on_bad_lines='skip',
                            sep=',',
                            quotechar='"',
                            skipinitialspace=True)
 
-        # Debug: Log dataframe info
-        logger.info(f"Loaded DataFrame shape: {df.shape}")
-        logger.info(f"DataFrame columns: {list(df.columns)}")
-        if not df.empty:
-            logger.info(f"First few rows:\n{df.head()}")
+        # Debug: Log dataframe info (df.head() formatting is expensive, so only when enabled)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Loaded DataFrame shape: %s", df.shape)
+            logger.debug("DataFrame columns: %s", list(df.columns))
+            if not df.empty:
+                logger.debug("First few rows:\n%s", df.head())
 
         if df.empty:
             logger.warning("Google Sheets CSV is empty")
@@ -190,70 +406,107 @@ class CSVManager:
         missing_columns = [col for col in required_columns if col not in df.columns]
 
         if missing_columns:
-            logger.error(f"Missing required columns in Google Sheets: {missing_columns}")
-            logger.error(f"Available columns: {list(df.columns)}")
+            logger.error("Missing required columns in Google Sheets: %s", missing_columns)
+            logger.error("Available columns: %s", list(df.columns))
             raise ValueError(f"Missing required columns: {missing_columns}")
 
         # Clean and validate data
         df = self._clean_data(df)
 
+        self._write_sheets_pickle_cache(df, content_hash)
+        self._sheets_content_hash = content_hash
+
         return df
 
+    def append_rows(self, rows: List[Tuple[str, str, str]]) -> None:
+        """Append (question, answer, category) rows to the CSV file in a single write."""
+        if not rows:
+            return
+
+        try:
+            with open(self.csv_file_path, 'rb') as f:
+                header = f.readline().decode('utf-8-sig')
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(size - 1, 0))
+                needs_newline = size > 0 and f.read(1) not in (b'\n', b'\r')
+            fieldnames = next(csv.reader([header])) if header.strip() else list(KNOWLEDGE_BASE_COLUMNS)
+        except FileNotFoundError:
+            fieldnames, needs_newline = list(KNOWLEDGE_BASE_COLUMNS), False
+
+        updated = datetime.now().strftime("%Y-%m-%d")
+        with open(self.csv_file_path, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore', lineterminator='\n')
+            if f.tell() == 0:
+                writer.writeheader()
+            elif needs_newline:
+                f.write('\n')
+            writer.writerows(
+                {'Question': question, 'Answer': answer, 'Category': category, 'Last Updated': updated}
+                for question, answer, category in rows
+            )
+
     def add_question_answer(self, question: str, answer: str, category: str = "AI_Generated"):
         """Добавить новый вопрос и ответ в CSV файл."""
         try:
-            # Создаем новую запись
-            new_entry = {
-                'Question': question,
-                'Answer': answer,
-                'Category': category,
-                'Source': 'AI_Generated'
-            }
-
             # Добавляем в CSV
-            self.append_to_csv(new_entry)
+            self.append_rows([(question, answer, category)])
 
             # Обновляем кэш
             self.refresh_cache()
 
-            logger.info(f"Добавлен новый вопрос в CSV: {question[:50]}...")
+            logger.info("Добавлен новый вопрос в CSV: %.50s...", question)
             return True
         except Exception as e:
-            logger.error(f"Ошибка при добавлении вопроса в CSV: {str(e)}")
+            logger.error("Ошибка при добавлении вопроса в CSV: %s", e)
             return False
 
     def _clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Clean and validate the knowledge base data."""
-        # Remove empty rows
-        df = df.dropna(subset=['Question', 'Answer'])
+        # Remove empty rows and rows with empty questions or answers in a single filter
+        questions = df['Question'].astype(str).str.strip()
+        answers = df['Answer'].astype(str).str.strip()
+        mask = df['Question'].notna() & df['Answer'].notna() & questions.ne('') & answers.ne('')
+        df = df.loc[mask].copy()
 
-        # Remove rows with empty questions or answers
-        df = df[df['Question'].str.strip() != '']
-        df = df[df['Answer'].str.strip() != '']
+        # Reuse the already stripped text
+        df['Question'] = questions[mask]
+        df['Answer'] = answers[mask]
 
         # Convert Priority to numeric if it exists
         if 'Priority' in df.columns:
-            df['Priority'] = pd.to_numeric(df['Priority'], errors='coerce')
+            # NumPy float so coerced values are NaN, not a pyarrow NA that fillna misses
+            df['Priority'] = pd.to_numeric(df['Priority'], errors='coerce').astype('float64')
             df['Priority'] = df['Priority'].fillna(5)  # Default priority
         else:
             df['Priority'] = 5  # Default priority for all
+        df['Priority'] = df['Priority'].round().clip(-128, 127).fillna(5).astype('int8')
 
-        # Convert Last Updated to datetime if it exists
+        # Convert Last Updated to datetime if it exists (explicit ISO 8601 format
+        # keeps pandas on the vectorized parser instead of per-row dateutil)
         if 'Last Updated' in df.columns:
-            df['Last Updated'] = pd.to_datetime(df['Last Updated'], errors='coerce')
+            # (stripped first: ISO 8601 parsing rejects values with trailing spaces)
+            last_updated = df['Last Updated'].astype('string').str.strip()
+            df['Last Updated'] = pd.to_datetime(last_updated, format='ISO8601', errors='coerce')
+
+        # Strip whitespace from Category (Question and Answer are stripped above)
+        df['Category'] = df['Category'].astype(str).str.strip()
 
-        # Strip whitespace from text columns
-        text_columns = ['Category', 'Question', 'Answer']
-        for col in text_columns:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.strip()
+        # Pre-process questions once for matching: lowercase, drop
+        # punctuation and sort tokens (token_sort_ratio without per-query work)
+        # (Python re rather than .str.replace: Arrow-backed strings use RE2,
+        # where \w does not match Cyrillic)
+        df['_q_processed'] = df['Question'].map(
+            lambda question: ' '.join(sorted(_NONWORD_RE.sub(' ', question.lower()).split()))
+        )
 
         return df
 
     def refresh_cache(self) -> None:
         """Force refresh of cached data."""
         logger.info("Forcing cache refresh")
-        self.data_cache = None
+        # Expire the cache and re-read the local file; the current snapshot stays
+        # in place for concurrent readers until the reloaded one replaces it
         self.cache_time = None
         self.last_modified = None
         self.get_knowledge_base()
@@ -281,5 +534,5 @@ class CSVManager:
             return stats
 
         except Exception as e:
-            logger.error(f"Failed to get knowledge base stats: {str(e)}")
+            logger.error("Failed to get knowledge base stats: %s", e)
             return {"error": str(e)}
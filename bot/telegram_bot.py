@@ -1,21 +1,167 @@
 """
 Телеграм-бот помощник электромонтера.
 """
-from groq import Groq
+from aiohttp import web
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
+from groq import AsyncGroq
 import httpx
+import asyncio
+import hashlib
 import os
+import re
+import signal
+import time
 import logging #Модуль стандартной библиотеки Python для логирования событий
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import ChatType
+from telegram.error import RetryAfter
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ContextTypes
-from typing import List, Dict
+from typing import Any, Awaitable, Callable, Dict, Final, List, Optional, Tuple
+from datetime import timedelta
+from functools import lru_cache
 
 
 
-from .sheets_manager import CSVManager
-from .question_matcher import QuestionMatcher
+from utils.keep_alive import add_status_routes, keep_alive
+from .sheets_manager import CSVManager, KnowledgeBaseSnapshot
+from .question_matcher import Match, QuestionMatcher
 
 logger = logging.getLogger(__name__)
 
+# Outgoing messages: Telegram allows about 30 messages per second per bot
+# and about 20 messages per minute per group (kept slightly below)
+_SEND_RATE_LIMIT = 30
+_GROUP_SEND_RATE_LIMIT = 18
+_CHAT_LIMITERS_SIZE = 10000
+_SEND_ATTEMPTS = 3
+
+# Groq HTTP connection pool, shared by concurrent AI requests
+_GROQ_MAX_CONNECTIONS = 100
+_GROQ_MAX_KEEPALIVE_CONNECTIONS = 50
+_GROQ_TIMEOUT = 30.0
+
+# AI answers are reused for an hour
+_GROQ_CACHE_SIZE = 1024
+_GROQ_CACHE_TTL = 3600
+
+# Fuzzy matching slower than this (seconds) starts the AI request speculatively
+_GROQ_SPECULATION_DELAY = 0.05
+
+_WS_RE = re.compile(r'\s+')
+
+# Category button data after "cat_": <category list hash>_<position>
+_CATEGORY_POSITION_RE = re.compile(r'([0-9a-f]{8})_(\d+)')
+
+# Unanswered questions and AI answers are written to CSV in batches of up to this size
+_WRITE_BATCH_SIZE = 32
+_WRITE_DRAIN_TIMEOUT = 10
+
+_WELCOME_MD: Final[str] = """
+Привет!Я Voltic🤖- твой цифровой напарник-электромонтер! ✨
+
+**Как со мной работать:**
+• Просто введи свой вопрос, и я поищу информацию в нашей базе знаний.
+• Используйте /categories, чтобы увидеть доступные темы.
+• Используйте /help, чтобы получить дополнительную информацию.
+
+Давай попробуем, это просто!  🚀
+"""
+
+_HELP_MD: Final[str] = """
+📚 **Доступные команды:**
+
+/start - приветственное сообщение и инструкции;
+/help - справочное сообщение;
+/categories - список категорий;
+/stats - показать статистику базы знаний;
+/refresh - обновить кэш базы знаний.
+
+**Как задавать вопросы:**
+Просто введите и отправьте свой вопрос в поле для ввода текста! Я найду наиболее релевантные ответы, используя возможные соответствия.
+
+**Советы для достижения наилучших результатов:**
+• Задавайте четкие и конкретные вопросы;
+• Используйте релевантные ключевые слова;
+• Попробуйте другие формулировки, если результаты неудовлетворительны.
+
+**Примеры вопросов:**
+• "Напиши закон Ома";
+• "Формула для расчета мощности электродвигателя";
+• "Какая допустимая перегрузка электродвигателя?".
+
+Если Вы не нашли то, что искали, попробуйте перефразировать свой вопрос и я обязательно помогу Вам!
+"""
+
+_CATEGORIES_MD: Final[str] = "📋 **Доступные категории:**\n\nНажмите на категорию, чтобы просмотреть вопросы:"
+
+# Reply templates (#**Твой вопрос:** {question} is intentionally not shown)
+_ANSWER_TEMPLATE: Final[str] = (
+    "🎯 **Вот что мне удалось найти!\n"
+    "\n"
+    "\n"
+    "{answer}\n"
+    "\n"
+    "**Категория:** {category}\n"
+    "**(Совпадение: {score}%)\n"
+)
+
+_MORE_MATCHES_TEMPLATE: Final[str] = "\n💡 Найдены {total_matches} похожих ответа"
+
+_ALTERNATIVES_HEADER: Final[str] = "🔍 **Другие похожие вопросы:**\n\n"
+_ALTERNATIVE_TEMPLATE: Final[str] = "**{i}.** {question}\n*Совпадение: {score}%*\n\n"
+_ALTERNATIVES_FOOTER: Final[str] = "Введите более конкретный вопрос, чтобы получить точный ответ, который вам нужен!"
+
+_STATS_TEMPLATE: Final[str] = """
+📊 **Статистика базы знаний:**
+
+• Всего вопросов: {total_questions}
+• Категории: {categories}
+• Последнее обновление: {last_updated}
+
+**Разбивка по категориям:**
+            """
+_STATS_CATEGORY_TEMPLATE: Final[str] = "• {category}: {count} вопрос\n"
+
+_CATEGORIES_OUTDATED: Final[str] = "Категория не найдена. Откройте /categories ещё раз."
+
+_CATEGORY_QUESTIONS_HEADER: Final[str] = "📋 **Вопросы в {category}:**\n\n"
+_CATEGORY_QUESTION_TEMPLATE: Final[str] = "• {question}\n"
+_CATEGORY_MORE_TEMPLATE: Final[str] = "\n... и {remaining} еще вопросы"
+_CATEGORY_QUESTIONS_FOOTER: Final[str] = "\n\nПросто введите свой вопрос и получите ответ!"
+
+_AI_UNAVAILABLE: Final[str] = (
+    "Извините, сервис ИИ временно недоступен. "
+    "Попробуйте перефразировать вопрос или повторите попытку позже."
+)
+
+_AI_RESPONSE_TEMPLATE: Final[str] = (
+    "🤖 **Ответ от ИИ-помощника:**\n"
+    "{ai_response}\n"
+    "\n"
+    "💡 Этот ответ был сгенерирован и добавлен в нашу базу знаний.\n"
+    "Если ответ неточный или неполный, пожалуйста, уточните свой вопрос."
+)
+
+
+@lru_cache(maxsize=1)
+def get_groq_client(api_key: str) -> AsyncGroq:
+    """Get the shared async Groq client with a pooled HTTP connection."""
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=_GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=_GROQ_MAX_KEEPALIVE_CONNECTIONS
+        ),
+        timeout=_GROQ_TIMEOUT
+    )
+    return AsyncGroq(api_key=api_key, http_client=http_client)
+
+
+def _normalize_ai_question(question: str) -> str:
+    """Normalize a question for the Groq answer cache and request coalescing."""
+    return _WS_RE.sub(' ', question.strip().lower())
+
+
 class TelegramBot:
     """Main Telegram bot class."""
 
@@ -31,18 +177,42 @@ class TelegramBot:
         self.groq_client = None
         if self.groq_api_key:
             try:
-                self.groq_client = Groq(api_key=self.groq_api_key)
+                self.groq_client = get_groq_client(self.groq_api_key)
                 logger.info("Groq API успешно инициализирован")
-
-                        # Проверка доступных моделей
-                try:
-                    models = self.groq_client.models.list()
-                    logger.info(f"Доступные модели: {[m.id for m in models.data]}")
-                except Exception as e:
-                    logger.warning(f"Ошибка проверки моделей: {str(e)}")
             except Exception as e:
-                logger.error(f"Ошибка инициализации Groq: {str(e)}")
-                logger.error(f"Тип ошибки: {type(e).__name__}")
+                logger.error("Ошибка инициализации Groq: %s", e)
+                logger.error("Тип ошибки: %s", type(e).__name__)
+
+        # Knowledge base snapshot, re-validated with CSVManager at most once per cache period
+        self._kb_snapshot = None
+        self._kb_snapshot_ts = 0.0
+        self._kb_lock = asyncio.Lock()
+
+        # Token bucket for outgoing Bot API messages
+        self._bucket = AsyncLimiter(max_rate=_SEND_RATE_LIMIT, time_period=1)
+        # Per-group token buckets, idle groups are dropped after an hour
+        self._chat_limiters = TTLCache(maxsize=_CHAT_LIMITERS_SIZE, ttl=3600)
+
+        # /categories keyboard and the knowledge base version it was built from
+        self._categories_keyboard = None
+        self._categories_keyboard_version = None
+
+        # Match results keyed by (knowledge base version, normalized question)
+        self._answer_cache = TTLCache(maxsize=1024, ttl=600)
+
+        # In-flight Groq requests keyed by question hash, shared by identical questions,
+        # and the number of callers waiting for each
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._pending_waiters: Dict[str, int] = {}
+
+        # Successful Groq answers keyed by normalized question
+        self._groq_cache = TTLCache(maxsize=_GROQ_CACHE_SIZE, ttl=_GROQ_CACHE_TTL)
+
+        # Normalized questions whose AI answer was queued for the knowledge base
+        self._saved_ai_answers = TTLCache(maxsize=_GROQ_CACHE_SIZE, ttl=_GROQ_CACHE_TTL)
+
+        # Pending CSV writes: ("unanswered", question, user_id, username) or ("answer", question, answer, category)
+        self._write_queue: asyncio.Queue = asyncio.Queue()
 
         self.application = None
         self._setup_bot()
@@ -69,41 +239,134 @@ class TelegramBot:
             logger.info("Настройка бота Telegram завершена")
 
         except Exception as e:
-            logger.error(f"Не удалось настроить Telegram-бот: {str(e)}")
+            logger.error("Не удалось настроить Telegram-бот: %s", e)
             raise
 
+    def _chat_limiter(self, update: Update) -> Optional[AsyncLimiter]:
+        """Получить лимитер для группового чата (в личных чатах ограничения нет)."""
+        chat = update.effective_chat
+        if chat is None or chat.type not in (ChatType.GROUP, ChatType.SUPERGROUP):
+            return None
+
+        limiter = self._chat_limiters.get(chat.id)
+        if limiter is None:
+            limiter = AsyncLimiter(max_rate=_GROUP_SEND_RATE_LIMIT, time_period=60)
+            self._chat_limiters[chat.id] = limiter
+        return limiter
+
+    async def _send(self, update: Update, send: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Отправить сообщение с учётом лимитов Telegram, повторяя попытку после RetryAfter."""
+        chat_limiter = self._chat_limiter(update)
+        for attempt in range(1, _SEND_ATTEMPTS + 1):
+            try:
+                if chat_limiter is not None:
+                    await chat_limiter.acquire()
+                async with self._bucket:
+                    return await send(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == _SEND_ATTEMPTS:
+                    raise
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                logger.warning("Превышен лимит Telegram, повтор через %s с", retry_after)
+                await asyncio.sleep(retry_after)
+
+    async def _kb(self) -> KnowledgeBaseSnapshot:
+        """Получить снимок базы знаний, обновляемый не чаще раза в период кэширования."""
+        if not self._kb_snapshot_stale():
+            return self._kb_snapshot
+
+        # One reload at a time, concurrent handlers wait for it and reuse the result
+        async with self._kb_lock:
+            if self._kb_snapshot_stale():
+                # Loading may read the CSV or download the sheet, keep it off the event loop
+                self._kb_snapshot = await asyncio.to_thread(self.csv_manager.get_snapshot)
+                self._kb_snapshot_ts = time.monotonic()
+        return self._kb_snapshot
+
+    def _kb_snapshot_stale(self) -> bool:
+        """Check whether the knowledge base snapshot has to be re-validated."""
+        return (
+            self._kb_snapshot is None
+            or time.monotonic() - self._kb_snapshot_ts > self.config.cache_duration * 60
+        )
+
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command."""
-        welcome_message = """
+        await self._send(update, update.message.reply_text, _WELCOME_MD, parse_mode='Markdown')
 
-Привет!Я Voltic🤖- твой цифровой напарник-электромонтер! ✨
+    async def get_groq_response(self, user_question: str) -> Optional[str]:
+        """Получить ответ от Groq API, объединяя одинаковые одновременные запросы (None, если ответа нет)."""
+        cached = self._groq_cache.get(_normalize_ai_question(user_question))
+        if cached is not None:
+            logger.info("Ответ Groq взят из кэша: %s", user_question)
+            return cached
 
-**Как со мной работать:**
-• Просто введи свой вопрос, и я поищу информацию в нашей базе знаний.
-• Используйте /categories, чтобы увидеть доступные темы.
-• Используйте /help, чтобы получить дополнительную информацию.
+        key, request = self._join_groq_request(user_question)
+        try:
+            # Shielded so a cancelled caller only stops waiting; the request itself
+            # is cancelled when no caller waits for it any more
+            return await asyncio.shield(request)
+        finally:
+            self._leave_groq_request(key, request)
+
+    def _start_speculative_groq(self, user_question: str) -> Optional[Tuple[str, asyncio.Task]]:
+        """Начать запрос к Groq заранее, если ответа ещё нет в кэше."""
+        if not self.groq_client or _normalize_ai_question(user_question) in self._groq_cache:
+            return None
+        return self._join_groq_request(user_question)
+
+    def _join_groq_request(self, user_question: str) -> Tuple[str, asyncio.Task]:
+        """Присоединиться к выполняющемуся запросу к Groq с таким же вопросом или начать новый."""
+        normalized = _normalize_ai_question(user_question)
+        key = hashlib.blake2b(normalized.encode()).hexdigest()
+
+        request = self._pending.get(key)
+        if request is None:
+            request = asyncio.create_task(self._request_groq_response(user_question, normalized))
+            self._pending[key] = request
+            self._pending_waiters[key] = 0
+            request.add_done_callback(lambda done: self._forget_groq_request(key, done))
+        else:
+            logger.info("Ожидание ответа Groq на такой же вопрос: %s", user_question)
+
+        self._pending_waiters[key] += 1
+        return key, request
+
+    def _leave_groq_request(self, key: str, request: asyncio.Task) -> None:
+        """Перестать ждать запрос к Groq; незавершённый запрос без ожидающих отменяется."""
+        if self._pending.get(key) is not request:
+            return
 
-Давай попробуем, это просто!  🚀
-        """
+        self._pending_waiters[key] -= 1
+        if self._pending_waiters[key] == 0 and not request.done():
+            # Nobody needs the answer any more, cancelling aborts the HTTP request
+            self._forget_groq_request(key, request)
+            request.cancel()
 
-        await update.message.reply_text(welcome_message, parse_mode='Markdown')
+    def _forget_groq_request(self, key: str, request: asyncio.Task) -> None:
+        """Убрать запрос из выполняющихся, если он ещё зарегистрирован под этим ключом."""
+        if self._pending.get(key) is request:
+            del self._pending[key]
+            del self._pending_waiters[key]
 
-    async def get_groq_response(self, user_question: str) -> str:
-        """Получить ответ от Groq API."""
+    async def _request_groq_response(self, user_question: str, cache_key: str) -> Optional[str]:
+        """Запросить ответ у Groq API и сохранить успешный ответ в кэше (None при ошибке или пустом ответе)."""
         # Добавляем подробное логирование
-        logger.info(f"Получен запрос к Groq API: {user_question}")
+        logger.info("Получен запрос к Groq API: %s", user_question)
 
         if not self.groq_client:
             logger.error("Groq клиент не инициализирован")
-            return "Извините, сервис ИИ временно недоступен."
+            return None
 
         if not self.groq_api_key:
             logger.error("API ключ Groq не установлен")
-            return "Извините, конфигурация ИИ не завершена."
+            return None
 
         try:
-            logger.info(f"Отправка запроса к модели: meta-llama/llama-4-scout-17b-16e-instruct")
-            chat_completion = self.groq_client.chat.completions.create(
+            logger.info("Отправка запроса к модели: meta-llama/llama-4-scout-17b-16e-instruct")
+            chat_completion = await self.groq_client.chat.completions.create(
                 messages=[
                     {"role": "system",
                      "content": "Ты - профессиональный помощник электромонтера. Отвечай на вопросы по электротехнике точно, кратко и по делу на русском языке."},
@@ -114,109 +377,92 @@ class TelegramBot:
                 max_tokens=512
             )
             response = chat_completion.choices[0].message.content
-            logger.info(f"Получен ответ от Groq API: {response[:100]}...")
+            if not response or not response.strip():
+                logger.warning("Groq API вернул пустой ответ")
+                return None
+            logger.info("Получен ответ от Groq API: %.100s...", response)
+            self._groq_cache[cache_key] = response
             return response
         except Exception as e:
-            logger.exception(f"КРИТИЧЕСКАЯ ОШИБКА при запросе к Groq API: {str(e)}")
-            return "Извините, произошла ошибка при обработке вашего запроса."
+            logger.exception("КРИТИЧЕСКАЯ ОШИБКА при запросе к Groq API: %s", e)
+            return None
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /help command."""
-        help_message = """
-📚 **Доступные команды:**
-
-/start - приветственное сообщение и инструкции;
-/help - справочное сообщение;
-/categories - список категорий;
-/stats - показать статистику базы знаний;
-/refresh - обновить кэш базы знаний.
-
-**Как задавать вопросы:**
-Просто введите и отправьте свой вопрос в поле для ввода текста! Я найду наиболее релевантные ответы, используя возможные соответствия.
-
-**Советы для достижения наилучших результатов:**
-• Задавайте четкие и конкретные вопросы;
-• Используйте релевантные ключевые слова;
-• Попробуйте другие формулировки, если результаты неудовлетворительны.
-
-**Примеры вопросов:**
-• "Напиши закон Ома";
-• "Формула для расчета мощности электродвигателя";
-• "Какая допустимая перегрузка электродвигателя?".
-
-Если Вы не нашли то, что искали, попробуйте перефразировать свой вопрос и я обязательно помогу Вам!
-        """
-
-        await update.message.reply_text(help_message, parse_mode='Markdown')
+        await self._send(update, update.message.reply_text, _HELP_MD, parse_mode='Markdown')
 
     async def categories_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /categories command."""
         try:
-            knowledge_base = self.csv_manager.get_knowledge_base()
-            categories = self.question_matcher.get_categories(knowledge_base)
+            snapshot = await self._kb()
+            categories = snapshot.categories
 
             if not categories:
-                await update.message.reply_text("На данный момент категории недоступны.")
+                await self._send(update, update.message.reply_text, "На данный момент категории недоступны.")
                 return
 
-            # Create inline keyboard with categories
-            keyboard = []
-            for i in range(0, len(categories), 2):
-                row = [InlineKeyboardButton(categories[i], callback_data=f"cat_{categories[i]}")]
-                if i + 1 < len(categories):
-                    row.append(InlineKeyboardButton(categories[i + 1], callback_data=f"cat_{categories[i + 1]}"))
-                keyboard.append(row)
+            # Inline keyboard with categories, rebuilt only when the knowledge base changes
+            if self._categories_keyboard is None or self._categories_keyboard_version != snapshot.version:
+                # callback_data carries the category position, not its name (64-byte limit),
+                # together with the hash of the list the position refers to
+                buttons = [
+                    InlineKeyboardButton(category, callback_data=f"cat_{snapshot.categories_token}_{i}")
+                    for i, category in enumerate(categories)
+                ]
+                self._categories_keyboard = InlineKeyboardMarkup([buttons[i:i + 2] for i in range(0, len(buttons), 2)])
+                self._categories_keyboard_version = snapshot.version
 
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            reply_markup = self._categories_keyboard
 
-            message = "📋 **Доступные категории:**\n\nНажмите на категорию, чтобы просмотреть вопросы:"
-            await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+            await self._send(update, update.message.reply_text, _CATEGORIES_MD, reply_markup=reply_markup, parse_mode='Markdown')
 
         except Exception as e:
-            logger.error(f"Ошибка в команде категорий: {str(e)}")
-            await update.message.reply_text("Извините, мне не удалось получить категории прямо сейчас. Попробуйте позже.")
+            logger.error("Ошибка в команде категорий: %s", e)
+            await self._send(update, update.message.reply_text, "Извините, мне не удалось получить категории прямо сейчас. Попробуйте позже.")
 
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /stats command."""
         try:
-            stats = self.csv_manager.get_stats()
+            stats = await asyncio.to_thread(self.csv_manager.get_stats)
 
             if "error" in stats:
-                await update.message.reply_text("Извините, я не смог сейчас получить статистику.")
+                await self._send(update, update.message.reply_text, "Извините, я не смог сейчас получить статистику.")
                 return
 
-            message = f"""
-📊 **Статистика базы знаний:**
-
-• Всего вопросов: {stats.get('total_questions', 0)}
-• Категории: {stats.get('categories', 0)}
-• Последнее обновление: {stats.get('last_updated', 'Unknown')}
-
-**Разбивка по категориям:**
-            """
+            parts = [_STATS_TEMPLATE.format(
+                total_questions=stats.get('total_questions', 0),
+                categories=stats.get('categories', 0),
+                last_updated=stats.get('last_updated', 'Unknown')
+            )]
 
             if "category_breakdown" in stats:
-                for category, count in stats["category_breakdown"].items():
-                    message += f"• {category}: {count} вопрос\n"
+                parts.extend(
+                    _STATS_CATEGORY_TEMPLATE.format(category=category, count=count)
+                    for category, count in stats["category_breakdown"].items()
+                )
+
+            message = "".join(parts)
 
-            await update.message.reply_text(message, parse_mode='Markdown')
+            await self._send(update, update.message.reply_text, message, parse_mode='Markdown')
 
         except Exception as e:
-            logger.error(f"Ошибка в команде статистики: {str(e)}")
-            await update.message.reply_text("Извините, мне не удалось получить статистику прямо сейчас. Попробуйте позже.")
+            logger.error("Ошибка в команде статистики: %s", e)
+            await self._send(update, update.message.reply_text, "Извините, мне не удалось получить статистику прямо сейчас. Попробуйте позже.")
 
     async def refresh_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /refresh command."""
         try:
-            await update.message.reply_text("🔄 Обновление базы знаний...")
+            await self._send(update, update.message.reply_text, "🔄 Обновление базы знаний...")
 
-            self.csv_manager.refresh_cache()
+            async with self._kb_lock:
+                self._kb_snapshot = None
+                await asyncio.to_thread(self.csv_manager.refresh_cache)
 
-            await update.message.reply_text("✅ База знаний успешно обновлена!")
+            await self._send(update, update.message.reply_text, "✅ База знаний успешно обновлена!")
 
         except Exception as e:
-            logger.error(f"Ошибка в команде обновления: {str(e)}")
-            await update.message.reply_text("❌ Не удалось обновить базу знаний. Повторите попытку позже.")
+            logger.error("Ошибка в команде обновления: %s", e)
+            await self._send(update, update.message.reply_text, "❌ Не удалось обновить базу знаний. Повторите попытку позже.")
 
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button callbacks."""
@@ -228,33 +474,48 @@ class TelegramBot:
 
             if data.startswith("cat_"):
                 # Category selection
-                category = data[4:]  # Remove "cat_" prefix
+                category_ref = data[4:]  # Remove "cat_" prefix
+
+                snapshot = await self._kb()
+
+                position_ref = _CATEGORY_POSITION_RE.fullmatch(category_ref)
+                if position_ref:
+                    # Position in the category list the keyboard was built from
+                    token, position = position_ref.group(1), int(position_ref.group(2))
+                    if token != snapshot.categories_token or position >= len(snapshot.categories):
+                        # The category list changed since the keyboard was sent
+                        await self._send(update, query.edit_message_text, _CATEGORIES_OUTDATED)
+                        return
+                    category = snapshot.categories[position]
+                elif category_ref.isdigit():
+                    # Position without a list hash, the list it refers to is unknown
+                    await self._send(update, query.edit_message_text, _CATEGORIES_OUTDATED)
+                    return
+                else:
+                    # Keyboards sent before categories were referenced by position
+                    category = category_ref
 
-                knowledge_base = self.csv_manager.get_knowledge_base()
-                category_questions = knowledge_base[
-                    knowledge_base['Category'].str.lower() == category.lower()
-                ]
+                questions, total = snapshot.category_questions(category, 10)
 
-                if category_questions.empty:
-                    await query.edit_message_text(f"В категории не найдено вопросов: {category}")
+                if not questions:
+                    await self._send(update, query.edit_message_text, f"В категории не найдено вопросов: {category}")
                     return
 
                 # Show questions in this category
-                message = f"📋 **Вопросы в {category}:**\n\n"
-
-                for idx, row in category_questions.head(10).iterrows():
-                    message += f"• {row['Question']}\n"
+                parts = [_CATEGORY_QUESTIONS_HEADER.format(category=category)]
+                parts.extend(_CATEGORY_QUESTION_TEMPLATE.format(question=question) for question in questions)
 
-                if len(category_questions) > 10:
-                    message += f"\n... и {len(category_questions) - 10} еще вопросы"
+                if total > 10:
+                    parts.append(_CATEGORY_MORE_TEMPLATE.format(remaining=total - 10))
 
-                message += "\n\nПросто введите свой вопрос и получите ответ!"
+                parts.append(_CATEGORY_QUESTIONS_FOOTER)
+                message = "".join(parts)
 
-                await query.edit_message_text(message, parse_mode='Markdown')
+                await self._send(update, query.edit_message_text, message, parse_mode='Markdown')
 
         except Exception as e:
-            logger.error(f"Ошибка в кнопке обратного вызова: {str(e)}")
-            await query.edit_message_text("Извините, что-то пошло не так. Попробуйте ещё раз.")
+            logger.error("Ошибка в кнопке обратного вызова: %s", e)
+            await self._send(update, query.edit_message_text, "Извините, что-то пошло не так. Попробуйте ещё раз.")
 
     async def handle_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle user questions."""
@@ -262,139 +523,249 @@ class TelegramBot:
         user_id = update.effective_user.id
         username = update.effective_user.username or "Unknown"
 
-        logger.info(f"Вопрос от пользователя {username} ({user_id}): {user_question}")
+        logger.info("Вопрос от пользователя %s (%s): %s", username, user_id, user_question)
 
+        groq_request = None
         try:
-            # Get knowledge base
-            knowledge_base = self.csv_manager.get_knowledge_base()
+            # Get knowledge base (frame, columns and version of the same load)
+            snapshot = await self._kb()
 
-            if knowledge_base.empty:
-                await update.message.reply_text(
+            if snapshot.data.empty:
+                await self._send(
+                    update, update.message.reply_text,
                     "Извините, база знаний сейчас пуста или обновляется.Попробуйте обратится немного позже."
                 )
                 return
 
-            # Find matches
-            matches = self.question_matcher.find_matches(user_question, knowledge_base)
+            # Find matches (repeated questions are answered from the cache until the knowledge base changes)
+            cache_key = (snapshot.version, self.question_matcher.normalize_question(user_question))
+            matches = self._answer_cache.get(cache_key)
+            if matches is None:
+                # Fuzzy matching runs in a worker thread. It usually finishes within a few
+                # milliseconds; only if it takes longer is the AI asked speculatively, so
+                # questions the knowledge base answers do not use up the Groq rate limit
+                match_task = asyncio.ensure_future(asyncio.to_thread(
+                    self.question_matcher.find_matches,
+                    user_question, snapshot.data, snapshot.columns
+                ))
+                done, _ = await asyncio.wait({match_task}, timeout=_GROQ_SPECULATION_DELAY)
+                if not done:
+                    groq_request = self._start_speculative_groq(user_question)
+                matches = await match_task
+                self._answer_cache[cache_key] = matches
 
             if not matches:
                 # No matches found
-                await self._send_no_matches_response(update, user_question)
+                await self._send_no_matches_response(update, user_question, groq_request)
                 return
 
-            # Send the best match
-            best_match = matches[0]
-            await self._send_answer(update, best_match, len(matches))
-
-            # If there are multiple good matches, offer alternatives
+            # Send the best match and, if there are multiple good matches,
+            # the alternatives in a single message
+            full_message = self._format_answer(matches[0], len(matches))
             if len(matches) > 1:
-                await self._send_alternative_answers(update, matches[1:])
+                full_message += "\n\n" + self._format_alternatives(matches[1:])
+
+            await self._send(update, update.message.reply_text, full_message, parse_mode='Markdown')
 
         except Exception as e:
-            logger.error(f"Вопрос об обработке ошибок: {str(e)}")
-            await update.message.reply_text(
+            logger.error("Вопрос об обработке ошибок: %s", e)
+            await self._send(
+                update, update.message.reply_text,
                 "Извините, при поиске ответа произошла ошибка. Повторите попытку позже."
             )
+        finally:
+            if groq_request is not None:
+                # Cancels the speculative request (and its HTTP call) unless another
+                # user with the same question is waiting for it
+                self._leave_groq_request(*groq_request)
 
-    async def _send_answer(self, update: Update, match: Dict, total_matches: int):
-        """Send the answer to the user."""
-        answer_message = f"""
-🎯 **Вот что мне удалось найти!
-
-
-{match['answer']}
-
-**Категория:** {match['category']}
-**(Совпадение: {match['score']}%)
-        """
-
-        #**Твой вопрос:** {match['question']}
+    def _format_answer(self, match: Match, total_matches: int) -> str:
+        """Build the answer message."""
+        answer_message = _ANSWER_TEMPLATE.format_map(match._asdict())
 
         if total_matches > 1:
-            answer_message += f"\n💡 Найдены {total_matches} похожих ответа"
+            answer_message += _MORE_MATCHES_TEMPLATE.format(total_matches=total_matches)
 
-        await update.message.reply_text(answer_message, parse_mode='Markdown')
+        return answer_message
 
-    async def _send_alternative_answers(self, update: Update, alternatives: List[Dict]):
-        """Send alternative answers if available."""
+    def _format_alternatives(self, alternatives: List[Match]) -> str:
+        """Build the alternative answers message."""
         if not alternatives:
-            return
-
-        alt_message = "🔍 **Другие похожие вопросы:**\n\n"
-
-        for i, alt in enumerate(alternatives[:3], 1):  # Show max 3 alternatives
-            alt_message += f"**{i}.** {alt['question']}\n"
-            alt_message += f"*Совпадение: {alt['score']}%*\n\n"
+            return ""
 
-        alt_message += "Введите более конкретный вопрос, чтобы получить точный ответ, который вам нужен!"
-
-        await update.message.reply_text(alt_message, parse_mode='Markdown')
+        return (
+            _ALTERNATIVES_HEADER
+            + "".join(
+                _ALTERNATIVE_TEMPLATE.format(i=i, question=alt.question, score=alt.score)
+                for i, alt in enumerate(alternatives[:3], 1)  # Show max 3 alternatives
+            )
+            + _ALTERNATIVES_FOOTER
+        )
 
-    async def _send_no_matches_response(self, update: Update, user_question: str):
+    async def _send_no_matches_response(self, update: Update, user_question: str,
+                                        groq_request: Optional[Tuple[str, asyncio.Task]] = None):
         """Send response when no matches are found and use Groq API to get an answer."""
         user_id = update.effective_user.id
         username = update.effective_user.username or "Unknown"
 
         # Логируем вопрос в CSV как неотвеченный
-        self.csv_manager.log_unanswered_question(user_question, user_id, username)
+        await self._write_queue.put(("unanswered", user_question, user_id, username))
 
         # Отправляем сообщение о том, что ищем ответ через ИИ
-        await update.message.reply_text("🔍 Не найдено в базе знаний... Запрашиваю у ИИ-помощника...")
+        await self._send(update, update.message.reply_text, "🔍 Не найдено в базе знаний... Запрашиваю у ИИ-помощника...")
 
-        # Получаем ответ от Groq
-        ai_response = await self.get_groq_response(user_question)
+        # Получаем ответ от Groq (запрос мог быть начат заранее, во время поиска)
+        if groq_request is not None:
+            ai_response = await asyncio.shield(groq_request[1])
+        else:
+            ai_response = await self.get_groq_response(user_question)
 
-        # Сохраняем новый вопрос и ответ в CSV
-        self.csv_manager.add_question_answer(user_question, ai_response, "AI_Generated")
+        if ai_response is None:
+            # Ответа нет: сообщаем об этом, в базу знаний ничего не добавляем
+            await self._send(update, update.message.reply_text, _AI_UNAVAILABLE)
+            return
+
+        # Сохраняем новый вопрос и ответ в CSV (только настоящий ответ ИИ и один раз
+        # для одинаковых вопросов, получивших общий ответ)
+        normalized = _normalize_ai_question(user_question)
+        if normalized not in self._saved_ai_answers:
+            self._saved_ai_answers[normalized] = True
+            await self._write_queue.put(("answer", user_question, ai_response, "AI_Generated"))
 
         # Формируем и отправляем ответ пользователю
-        response_message = f"""
-    🤖 **Ответ от ИИ-помощника:**
-    {ai_response}
+        response_message = _AI_RESPONSE_TEMPLATE.format(ai_response=ai_response)
+        await self._send(update, update.message.reply_text, response_message, parse_mode='Markdown')
 
-    💡 Этот ответ был сгенерирован и добавлен в нашу базу знаний.
-    Если ответ неточный или неполный, пожалуйста, уточните свой вопрос.
-        """
-        await update.message.reply_text(response_message, parse_mode='Markdown')
+    async def _handle_webhook(self, request: web.Request) -> web.Response:
+        """Передать обновление, присланное Telegram, в очередь приложения."""
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        await self.application.update_queue.put(Update.de_json(data, self.application.bot))
+        return web.Response()
+
+    async def _start_webhook_server(self) -> web.AppRunner:
+        """Start the aiohttp server for Telegram updates and keep-alive pings, then register the webhook."""
+        app = web.Application()
+        app.router.add_post(f"/{self.config.telegram_token}", self._handle_webhook)
+        add_status_routes(app)
+
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "0.0.0.0", self.config.webhook_port).start()
+
+        await self.application.bot.set_webhook(
+            url=f"{self.config.webhook_url.rstrip('/')}/{self.config.telegram_token}",
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True
+        )
+        return runner
+
+    async def _writer_loop(self):
+        """Записывать накопленные вопросы и ответы в CSV пачками."""
+        while True:
+            batch = [await self._write_queue.get()]
+            while len(batch) < _WRITE_BATCH_SIZE and not self._write_queue.empty():
+                batch.append(self._write_queue.get_nowait())
+
+            unanswered = [entry[1:] for entry in batch if entry[0] == "unanswered"]
+            answers = [entry[1:] for entry in batch if entry[0] == "answer"]
+            try:
+                if unanswered:
+                    await asyncio.to_thread(self._log_unanswered, unanswered)
+                if answers:
+                    # New rows change the knowledge base, reload it like /refresh does
+                    async with self._kb_lock:
+                        await asyncio.to_thread(self._store_answers, answers)
+                        self._kb_snapshot = None
+            except Exception as e:
+                logger.error("Не удалось записать пачку из %s записей в CSV: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+
+    def _log_unanswered(self, entries: List[Tuple[str, Any, str]]):
+        """Записать неотвеченные вопросы."""
+        for user_question, user_id, username in entries:
+            self.csv_manager.log_unanswered_question(user_question, user_id, username)
+        # Flush every batch, so a quiet bot does not keep questions in the buffer
+        self.csv_manager.flush_unanswered()
+
+    def _store_answers(self, rows: List[Tuple[str, str, str]]):
+        """Добавить ответы ИИ в базу знаний одной записью и обновить кэш."""
+        self.csv_manager.append_rows(rows)
+        self.csv_manager.refresh_cache()
+        logger.info("Добавлено новых вопросов в CSV: %s", len(rows))
 
     async def run(self):
         """Start the bot."""
-        try:
-            logger.info("Starting Telegram bot...")
-
-            # Start the bot
-            await self.application.initialize()
-            await self.application.start()
-
-            # Start polling
-            await self.application.updater.start_polling(
-                allowed_updates=Update.ALL_TYPES,
-                drop_pending_updates=True
-            )
+        logger.info("Starting Telegram bot...")
 
-            logger.info("Bot is running and polling for updates...")
-
-            # Keep the bot running
-            import signal
-            import asyncio
+        # Load the knowledge base and its match/category indexes before the first question
+        try:
+            snapshot = await self._kb()
+            logger.info("Knowledge base preloaded: %s records", len(snapshot.data))
+        except Exception as e:
+            logger.warning("Failed to preload knowledge base: %s", e)
 
-            # Create a future that will be resolved when a signal is received
-            stop_signals = (signal.SIGTERM, signal.SIGINT)
-            loop = asyncio.get_running_loop()
+        writer_task = asyncio.create_task(self._writer_loop())
+        try:
+            # The context manager initializes the application and shuts it down on exit
+            async with self.application:
+                await self._serve()
+        except Exception as e:
+            logger.error("Error running bot: %s", e)
+            raise
+        finally:
+            # Handlers have finished by now, write what they queued
+            try:
+                await asyncio.wait_for(self._write_queue.join(), _WRITE_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Pending CSV writes were not finished before shutdown")
+            writer_task.cancel()
+            if self.groq_client is not None:
+                # Release the pooled connections of the shared client
+                await self.groq_client.close()
+                get_groq_client.cache_clear()
+
+    async def _serve(self):
+        """Receive updates until SIGTERM/SIGINT, then stop receiving and wait for running handlers."""
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop_event.set)
+
+        server_runner = None
+        await self.application.start()
+        try:
+            if self.config.webhook_url:
+                # Receive updates pushed by Telegram, no idle getUpdates requests;
+                # the same server on the event loop answers the keep-alive endpoints
+                server_runner = await self._start_webhook_server()
+
+                logger.info("Bot is running and receiving updates via webhook on port %s...", self.config.webhook_port)
+            else:
+                # Start polling
+                await self.application.updater.start_polling(
+                    allowed_updates=Update.ALL_TYPES,
+                    drop_pending_updates=True
+                )
 
-            for sig in stop_signals:
-                loop.add_signal_handler(sig, lambda s=sig: loop.stop())
+                logger.info("Bot is running and polling for updates...")
 
-            # Run until stopped
-            try:
-                await asyncio.Event().wait()
-            except asyncio.CancelledError:
-                pass
+                if self.config.keep_alive:
+                    # Keep-alive endpoints for Replit on the same event loop
+                    server_runner = await keep_alive()
 
-        except Exception as e:
-            logger.error(f"Error running bot: {str(e)}")
-            raise
+            await stop_event.wait()
+            logger.info("Stop signal received, shutting down...")
         finally:
-            # Cleanup
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(sig)
+            if server_runner is not None:
+                await server_runner.cleanup()
+            if self.application.updater.running:
+                await self.application.updater.stop()
             await self.application.stop()
-            await self.application.shutdown()
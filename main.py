@@ -9,7 +9,6 @@ import logging
 from bot.telegram_bot import TelegramBot
 from bot.config import Config
 from utils.logger import setup_logging
-from utils.keep_alive import keep_alive
 
 def main():
     """Основная функция запуска Telegram-бота"""
@@ -22,9 +21,6 @@ def main():
         config = Config()
         logger.info("Configuration loaded successfully")
         
-        # Start keep-alive server for Replit
-        #keep_alive()
-        
         # Create and start the Telegram bot
         bot = TelegramBot(config)
         logger.info("Starting Telegram bot...")
@@ -33,7 +29,7 @@ def main():
         asyncio.run(bot.run())
         
     except Exception as e:
-        logger.error(f"Failed to start bot: {str(e)}")
+        logger.error("Failed to start bot: %s", e)
         raise
 
 if __name__ == "__main__":
@@ -1,79 +1,73 @@
 """
 Keep-alive mechanism for Replit free hosting.
-Creates a simple HTTP server to prevent the application from sleeping.
+Runs a small aiohttp server on the bot's event loop to prevent the application from sleeping.
 """
 
 import os
 import logging
-import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
 from datetime import datetime
-import json
+from typing import Optional
+
+from aiohttp import web
+import orjson
 
 logger = logging.getLogger(__name__)
 
-class KeepAliveHandler(BaseHTTPRequestHandler):
-    """Simple HTTP handler for keep-alive requests."""
-    
-    def do_GET(self):
-        """Handle GET requests."""
-        if self.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
-                'status': 'alive',
-                'service': 'Employee Knowledge Bot',
-                'timestamp': datetime.now().isoformat(),
-                'message': 'Bot is running successfully!'
-            }
-            
-            self.wfile.write(json.dumps(response, indent=2).encode())
-            
-        elif self.path == '/health':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            health_response = {
-                'status': 'healthy',
-                'timestamp': datetime.now().isoformat(),
-                'uptime': 'unknown'
-            }
-            
-            self.wfile.write(json.dumps(health_response, indent=2).encode())
-            
-        else:
-            self.send_response(404)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            error_response = {
-                'error': 'Not Found',
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            self.wfile.write(json.dumps(error_response, indent=2).encode())
-    
-    def log_message(self, format, *args):
-        """Override to use our logger instead of default logging."""
-        logger.debug(f"Keep-alive request: {format % args}")
-
-def run_server():
-    try:
-        port = int(os.environ.get("PORT", 3000))  # <-- Исправлено
-        server = HTTPServer(('0.0.0.0', port), KeepAliveHandler)  # <-- Исправлено
-        logger.info(f"Keep-alive server started on port {port}")  # <-- Исправлено
-        server.serve_forever()
-    except Exception as e:
-        logger.error(f"Keep-alive server error: {str(e)}")
+# Static parts of the responses, only the timestamp is filled in per request
+_STATUS_RESPONSE_TEMPLATE = {
+    'status': 'alive',
+    'service': 'Employee Knowledge Bot',
+    'message': 'Bot is running successfully!'
+}
+_HEALTH_RESPONSE_TEMPLATE = {
+    'status': 'healthy',
+    'uptime': 'unknown'
+}
+_NOT_FOUND_RESPONSE_TEMPLATE = {
+    'error': 'Not Found'
+}
+
+
+def _json_response(template: dict, status: int = 200) -> web.Response:
+    """Build a JSON response from a template stamped with the current time."""
+    body = orjson.dumps({**template, 'timestamp': datetime.now().isoformat()}, option=orjson.OPT_INDENT_2)
+    return web.Response(body=body, status=status, content_type='application/json')
+
+
+async def handle_status(request: web.Request) -> web.Response:
+    """Handle GET / on the bot's aiohttp server."""
+    return _json_response(_STATUS_RESPONSE_TEMPLATE)
+
 
-def keep_alive():
-    """Start the keep-alive server in a separate thread."""
+async def handle_health(request: web.Request) -> web.Response:
+    """Handle GET /health on the bot's aiohttp server."""
+    return _json_response(_HEALTH_RESPONSE_TEMPLATE)
+
+
+async def handle_not_found(request: web.Request) -> web.Response:
+    """Handle GET requests to unknown paths."""
+    return _json_response(_NOT_FOUND_RESPONSE_TEMPLATE, status=404)
+
+
+def add_status_routes(app: web.Application) -> None:
+    """Register the keep-alive endpoints on an aiohttp application."""
+    app.router.add_get('/', handle_status)
+    app.router.add_get('/health', handle_health)
+
+
+async def keep_alive() -> Optional[web.AppRunner]:
+    """Start the keep-alive server on the running event loop."""
     try:
-        server_thread = threading.Thread(target=run_server, daemon=True)
-        server_thread.start()
-        logger.info("Keep-alive mechanism started")
+        port = int(os.environ.get("PORT", 3000))
+        app = web.Application()
+        add_status_routes(app)
+        app.router.add_get('/{tail:.*}', handle_not_found)
+
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, '0.0.0.0', port).start()
+        logger.info("Keep-alive server started on port %s", port)
+        return runner
     except Exception as e:
-        logger.error(f"Failed to start keep-alive mechanism: {str(e)}")
+        logger.error("Failed to start keep-alive mechanism: %s", e)
+        return None
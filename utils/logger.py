@@ -4,7 +4,6 @@ Logging configuration for the application.
 
 import logging
 import sys
-from datetime import datetime
 
 def setup_logging(level=logging.INFO):
     """Setup logging configuration."""
@@ -22,20 +21,34 @@ def setup_logging(level=logging.INFO):
             'RESET': '\033[0m'      # Reset
         }
         
+        def __init__(self, *args, use_color=True, **kwargs):
+            super().__init__(*args, **kwargs)
+            # Colored level names are built once instead of on every record
+            self._colored_levels = {
+                level: f"{color}{level}{self.COLORS['RESET']}"
+                for level, color in self.COLORS.items() if level != 'RESET'
+            } if use_color else {}
+        
         def format(self, record):
-            # Add color to level name
-            level_color = self.COLORS.get(record.levelname, self.COLORS['RESET'])
-            record.levelname = f"{level_color}{record.levelname}{self.COLORS['RESET']}"
-            
-            # Format timestamp
-            record.asctime = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S')
+            # asctime is filled in by logging.Formatter.formatTime using datefmt
+            colored_level = self._colored_levels.get(record.levelname)
+            if colored_level is None:
+                return super().format(record)
             
-            return super().format(record)
+            # Add color to level name for this handler only
+            levelname = record.levelname
+            record.levelname = colored_level
+            try:
+                return super().format(record)
+            finally:
+                record.levelname = levelname
     
     # Create formatter
     formatter = ColoredFormatter(
         fmt='%(asctime)s | %(levelname)s | %(name)s | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
+        datefmt='%Y-%m-%d %H:%M:%S',
+        # No escape codes when the output is not a terminal (e.g. Replit's log stream)
+        use_color=sys.stdout.isatty()
     )
     
     # Setup root logger